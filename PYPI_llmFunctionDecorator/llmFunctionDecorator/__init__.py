@@ -6,8 +6,58 @@ A Python module designed to simplify the process of creating and managing
 function calls to OpenAI's API, as well as models using LiteLLM's API framework.
 """
 
+import asyncio
 import inspect
-from functools import wraps
+import sys
+from collections import namedtuple
+from collections.abc import Iterable
+from functools import partial, wraps
+
+_TYPE_MAPPING = {  # Map Python types to JSON schema types.
+    int: 'integer',
+    float: 'number',
+    str: 'string',
+    bool: 'boolean',
+    list: "array",
+    tuple: "array",
+    dict: "object",
+    None: "null",
+}
+
+# Everything call_function needs for its fast path, stored per registered name in FunctionRegistry._dispatch
+_DispatchEntry = namedtuple('_DispatchEntry', ('enabled', 'func', 'param_names', 'required_names', 'tool'))
+
+
+def _keyword_parameters(function_ref):
+    """
+    Finds the parameters of a function that can be passed by keyword, and the parameters without a default.
+    Required positional-only parameters are included in the latter, so call_function's fast path (which
+    only passes keywords) never applies to functions that have them.
+    Reads the function's code object directly, falling back to inspect.signature for callables
+    without one (builtins, classes, bound methods) or that wrap another function.
+    :param function_ref: Reference to the function to inspect.
+    :return: Tuple of (parameter names, required parameter names) as frozensets.
+    """
+    if inspect.isfunction(function_ref) and not hasattr(function_ref, '__wrapped__'):
+        code = function_ref.__code__
+        all_positional = code.co_varnames[:code.co_argcount]
+        keyword_only = code.co_varnames[code.co_argcount:code.co_argcount + code.co_kwonlyargcount]
+        # Defaults apply to the last positional parameters (positional-only included); keyword-only defaults
+        # are kept separately
+        positional_required = all_positional[:code.co_argcount - len(function_ref.__defaults__ or ())]
+        keyword_only_defaults = function_ref.__kwdefaults__ or {}
+        return (
+            frozenset(all_positional[code.co_posonlyargcount:] + keyword_only),
+            frozenset(positional_required + tuple(name for name in keyword_only if name not in keyword_only_defaults)),
+        )
+
+    named_params = [param for param in inspect.signature(function_ref).parameters.values()
+                    if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY)]
+    return (
+        frozenset(param.name for param in named_params if param.kind != param.POSITIONAL_ONLY),
+        frozenset(param.name for param in named_params if param.default is param.empty),
+    )
+
 
 class FunctionRegistry:
     """
@@ -15,7 +65,14 @@ class FunctionRegistry:
     Enables registration, retrieval, and invocation of functions by name,
     along with their enabled status.
     """
-    _registry = {}
+    # Registered functions as parallel lists, in registration order, with a name -> position index
+    _names = []
+    _instances = []
+    _enabled = []
+    _index = {}
+    _enabled_count = 0          # Number of True entries in _enabled
+    _cached_tools_list = None   # Result of tools(), rebuilt after the enabled functions change
+    _dispatch = {}              # Interned name -> entry from _dispatch_entry, one lookup per call
 
     @classmethod
     def register_function(cls, name, tool_instance):
@@ -24,10 +81,70 @@ class FunctionRegistry:
         :param name: The name of the function to register.
         :param tool_instance: The ToolWrapper instance to register.
         """
-        cls._registry[name] = {
-            "instance": tool_instance,
-            "enabled": tool_instance.enabled
-        }
+        name = sys.intern(name)  # Interned so lookups with interned names can match on identity
+        index = cls._index.get(name)
+        if index is None:
+            cls._index[name] = len(cls._names)
+            cls._names.append(name)
+            cls._instances.append(tool_instance)
+            cls._enabled.append(tool_instance.enabled)
+        else:  # Re-registering a name replaces the previous entry in place
+            cls._enabled_count -= bool(cls._enabled[index])
+            cls._instances[index] = tool_instance
+            cls._enabled[index] = tool_instance.enabled
+        cls._enabled_count += bool(tool_instance.enabled)
+        cls._dispatch[name] = cls._dispatch_entry(tool_instance, tool_instance.enabled)
+        cls._cached_tools_list = None
+
+    @staticmethod
+    def _dispatch_entry(tool_instance, enabled):
+        """
+        Flattens everything call_function needs for its fast path into a single tuple.
+        :param tool_instance: The registered ToolWrapper instance.
+        :param enabled: The function's enabled status.
+        :return: _DispatchEntry of (enabled, func, param_names, required_names, tool).
+        """
+        return _DispatchEntry(enabled, tool_instance.function_ref, tool_instance._param_names,
+                              tool_instance._required_names, tool_instance)
+
+    @classmethod
+    def enable(cls, name):
+        """
+        Enables a registered function, making it available to the LLM and callable.
+        :param name: The name of the function to enable.
+        :raises: ValueError if the function is not registered.
+        """
+        cls._set_enabled(name, True)
+
+    @classmethod
+    def disable(cls, name):
+        """
+        Disables a registered function, hiding it from the LLM and preventing it from being called.
+        :param name: The name of the function to disable.
+        :raises: ValueError if the function is not registered.
+        """
+        cls._set_enabled(name, False)
+
+    @classmethod
+    def _set_enabled(cls, name, enabled):
+        """
+        Updates the enabled status of a registered function and the structures derived from it.
+        :param name: The name of the function to update.
+        :param enabled: The new enabled status.
+        :raises: ValueError if the function is not registered.
+        """
+        index = cls._index.get(name)
+        if index is None:
+            raise ValueError(f"The function '{name}' is not registered in the FunctionRegistry.")
+        if bool(cls._enabled[index]) == enabled:
+            return
+
+        tool_instance = cls._instances[index]
+        tool_instance.enabled = enabled
+        cls._enabled[index] = enabled
+        cls._enabled_count += 1 if enabled else -1
+        cls._dispatch[cls._names[index]] = cls._dispatch_entry(tool_instance, enabled)
+        cls._cached_tools_list = None
 
     @classmethod
     def get_registry(cls):
@@ -35,11 +152,7 @@ class FunctionRegistry:
         Returns a dictionary of all enabled function instances registered.
         :return: Dictionary of function name to ToolWrapper instance for enabled functions.
         """
-        enabled_functions = {}
-        for name, info in cls._registry.items():
-            if info["enabled"]:
-                enabled_functions[name] = info["instance"]
-        return enabled_functions
+        return {name: instance for name, instance, enabled in zip(cls._names, cls._instances, cls._enabled) if enabled}
 
     @classmethod
     def registry_status(cls):
@@ -47,24 +160,21 @@ class FunctionRegistry:
         Returns a string summary of all registered functions and their enabled status.
         :return: Formatted string listing function names and their enabled status.
         """
-        registry_entries = []
-        for name, info in cls._registry.items():
-            registry_entries.append(f"Function: {name}, Enabled: {info['enabled']}")
-        # Join the list into a single string with newline separators
-        return "\n".join(registry_entries)
+        # Join the entries into a single string with newline separators
+        return "\n".join(f"Function: {name}, Enabled: {enabled}" for name, enabled in zip(cls._names, cls._enabled))
 
     @classmethod
     def tools(cls):
         """
         Retrieve registered ToolWrapper instances and convert to their dictionary representations.
         This is what is sent to the model as the tools parameter.
+        Each call returns a new list, but the dictionaries in it are shared and must not be modified.
         :return: List of dictionaries representing each registered ToolWrapper instance. None if no tools are registered.
         """
-        # Retrieve registered ToolWrapper instances directly
-        registered_tools = cls.get_registry().values()
-        # Convert each ToolWrapper instance to its dictionary representation
-        tools = [tool.to_dict() for tool in registered_tools]
-        return tools if tools else None
+        if cls._cached_tools_list is None:
+            # Convert each enabled ToolWrapper instance to its dictionary representation
+            cls._cached_tools_list = [tool.to_dict() for tool, enabled in zip(cls._instances, cls._enabled) if enabled]
+        return list(cls._cached_tools_list) if cls._cached_tools_list else None
 
     @classmethod
     def tool_choice(cls, function_ref=None):
@@ -81,14 +191,15 @@ class FunctionRegistry:
         """
         if function_ref is None:
             # Check if registry has enabled functions; decide "auto" or None
-            return "auto" if any(info["enabled"] for info in cls._registry.values()) else None
+            return "auto" if cls._enabled_count else None
         else:
             if not callable(function_ref):
                 raise ValueError("The provided function_ref is not callable. Please provide a valid function.")
 
             function_name = function_ref.__name__
             # Check if the function is registered and enabled
-            if function_name in cls._registry and cls._registry[function_name]["enabled"]:
+            index = cls._index.get(function_name)
+            if index is not None and cls._enabled[index]:
                 return {
                     "type": "function",
                     "function": {
@@ -108,32 +219,90 @@ class FunctionRegistry:
         :param kwargs: Arguments to pass to the function call.
         :return: Result of the function call or error message.
         """
-        if name not in cls._registry:
+        entry = cls._dispatch.get(name)
+        if entry is None:
             return f"Function {name} is not registered and cannot be called."
 
-        tool_info = cls._registry[name]
-        if not tool_info["enabled"]:
+        enabled, func, param_names, required_names, tool_instance = entry
+        if not enabled:
             return f"Function {name} is currently disabled and cannot be called."
 
-        tool_instance = tool_info["instance"]
-        func = tool_instance.function_ref
-        sig = inspect.signature(func)  # Get function signature
+        # Fast path: every given argument is a known parameter and all required ones are present
+        if kwargs.keys() <= param_names and required_names <= kwargs.keys():
+            return func(**kwargs)
+
+        # Only partial inputs need the full signature; build it on first use and keep it
+        if tool_instance._signature is None:
+            tool_instance._signature = inspect.signature(func)
+        sig = tool_instance._signature
         try:
             bound_args = sig.bind(**kwargs)  # Bind given arguments
         except TypeError as e:
             return f"Error binding arguments for {name}: {e}"
-        bound_args.apply_defaults()  # Apply defaults for missing args
 
+        # Defaults for missing args are filled in by the call itself
         return func(*bound_args.args, **bound_args.kwargs)
 
+    @classmethod
+    async def acall_function(cls, name, **kwargs):
+        """
+        Asynchronous counterpart of call_function, for calling several functions concurrently.
+        Coroutine functions are awaited directly; regular functions are run in the event loop's
+        default executor so blocking tools don't hold up the event loop.
+        :param name: The name of the function to call.
+        :param kwargs: Arguments to pass to the function call.
+        :return: Result of the function call or error message.
+        """
+        entry = cls._dispatch.get(name)
+        if entry is not None and entry.tool._is_coroutine:
+            result = cls.call_function(name, **kwargs)
+            # Error messages are returned as plain strings rather than coroutines
+            return await result if inspect.isawaitable(result) else result
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(cls.call_function, name, **kwargs))
+
+    @classmethod
+    def execution_waves(cls, names):
+        """
+        Groups a sequence of function calls into waves that can each run concurrently.
+        Two calls conflict when one writes a resource the other reads or writes (see the reads and writes
+        arguments of @tool); a call is placed in the wave after the last earlier call it conflicts with,
+        so conflicting calls keep the order the model emitted them in. Unregistered names conflict with nothing.
+        :param names: Function names in the order the calls were requested.
+        :return: List of waves, each a list of indices into names.
+        """
+        accesses = []
+        for name in names:
+            entry = cls._dispatch.get(name)
+            accesses.append((entry.tool.reads, entry.tool.writes) if entry is not None else (frozenset(), frozenset()))
+
+        waves = []
+        wave_of = []
+        for i, (reads, writes) in enumerate(accesses):
+            wave = 0
+            for j in range(i):
+                earlier_reads, earlier_writes = accesses[j]
+                if writes & (earlier_reads | earlier_writes) or earlier_writes & reads:
+                    wave = max(wave, wave_of[j] + 1)
+            wave_of.append(wave)
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(i)
+        return waves
+
 
 class ToolWrapper:
     """
     A wrapper for functions providing additional metadata and utility methods.
     Registers itself upon instantiation.
     """
+    __slots__ = (
+        '_name', 'function_ref', 'enabled', '_purpose', 'reads', 'writes', '_parameters', '_required', '_required_set',
+        '_is_coroutine', '_param_names', '_required_names', '_signature', '_cached_dict',
+    )
 
-    def __init__(self, purpose, required=None, function_ref=None, enabled=True, **kwargs):
+    def __init__(self, purpose, required=None, function_ref=None, enabled=True, reads=None, writes=None, **kwargs):
         """
         Initializes a ToolWrapper instance with function reference, purpose, parameter info, and metadata.
         Automatically registers the function in the FunctionRegistry.
@@ -141,58 +310,137 @@ class ToolWrapper:
         :param required: List of required parameter names.
         :param function_ref: Reference to the actual function to wrap.
         :param enabled: Flag indicating if the function is initially enabled.
+        :param reads: List of resource names the function reads, used to order conflicting calls.
+        :param writes: List of resource names the function modifies, used to order conflicting calls.
         :param kwargs: Additional keyword arguments for parameter types and descriptions.
         """
         if function_ref is None:
             raise ValueError("'function_ref' must be provided")
         if not callable(function_ref):
             raise TypeError("'function_ref' must be callable")
-
+        for arg_name, resources in (('reads', reads), ('writes', writes)):
+            if resources is None:
+                continue
+            if isinstance(resources, str) or not isinstance(resources, Iterable) \
+                    or not all(isinstance(resource, str) for resource in resources):
+                raise TypeError(
+                    f"'{arg_name}' must be a list of resource names. '{arg_name}' is reserved by @tool and "
+                    f"cannot be used to describe a function parameter; rename the parameter."
+                )
+
+        self._cached_dict = None                # Dictionary representation returned by to_dict
         self.name = function_ref.__name__       # Function name
         self.function_ref = function_ref        # Reference to the actual function
+        self._is_coroutine = inspect.iscoroutinefunction(function_ref)  # Awaited directly by acall_function
         self.enabled = enabled                  # Store the provided enabled value or default to True
         self.purpose = purpose.strip()          # Purpose/description of the function
+        self.reads = frozenset(reads or ())     # Resources read by the function
+        self.writes = frozenset(writes or ())   # Resources modified by the function
         self.parameters = {}                    # Dictionary to hold parameter info
         self.required = required or []          # List of required parameter names
 
-        # Inspect the function's parameters
-        func_signature = inspect.signature(function_ref).parameters
+        # Inspect the function's parameters once; reused on every call_function
+        self._param_names, self._required_names = _keyword_parameters(function_ref)
+        self._signature = None  # Full inspect.Signature, only built when call_function needs to bind arguments
 
-        # Create a set of parameter names for which descriptions are expected to be provided
-        param_keys = {key for key in kwargs if not key.endswith('_description')}
-        # Create a set of parameter descriptions, stripping '_description' from the keys
-        description_keys = {key.replace('_description', '') for key in kwargs if key.endswith('_description')}
+        # Split kwargs in a single pass into parameter types and descriptions (keyed without '_description')
+        param_info_map, desc_map = {}, {}
+        for key, value in kwargs.items():
+            if key.endswith('_description'):
+                desc_map[key[:-len('_description')]] = value
+            else:
+                param_info_map[key] = value
 
         # Verify each parameter against the function's signature
-        for param_name in param_keys:
-            if param_name not in func_signature:
-                raise ValueError(
-                    f"Parameter '{param_name}' doesn't exist in the function '{function_ref.__name__}'")
+        unknown_params = param_info_map.keys() - self._param_names
+        if unknown_params:
+            param_name = next(name for name in param_info_map if name in unknown_params)
+            raise ValueError(
+                f"Parameter '{param_name}' doesn't exist in the function '{function_ref.__name__}'")
 
         # Check for descriptions provided without the corresponding parameter
-        for desc_key in description_keys:
-            if desc_key not in param_keys:
-                raise ValueError(f"Description provided for '{desc_key}', but '{desc_key}' parameter is not present")
+        orphan_descriptions = desc_map.keys() - param_info_map.keys()
+        if orphan_descriptions:
+            desc_key = next(name for name in desc_map if name in orphan_descriptions)
+            raise ValueError(f"Description provided for '{desc_key}', but '{desc_key}' parameter is not present")
 
         # Check for each parameter having a corresponding description
-        for param_name in param_keys:
-            if param_name not in description_keys:
-                raise ValueError(f"Description for '{param_name}' not provided")
-            # Add parameter information using the _add_parameter method
-            self._add_parameter(param_name, kwargs[param_name])
-
-        # Add parameter descriptions
-        for param_name, param_description in kwargs.items():
-            if param_name.endswith('_description'):
-                true_param_name = param_name.replace('_description', '')
-                if true_param_name in self.parameters:
-                    self.parameters[true_param_name]['description'] = param_description
+        missing_descriptions = param_info_map.keys() - desc_map.keys()
+        if missing_descriptions:
+            param_name = next(name for name in param_info_map if name in missing_descriptions)
+            raise ValueError(f"Description for '{param_name}' not provided")
+
+        # Add parameter information and descriptions using the _add_parameter method
+        for param_name, param_info in param_info_map.items():
+            self._add_parameter(param_name, param_info)
+            self.parameters[param_name]['description'] = desc_map[param_name]
 
         # Ensure all required parameters are amongst those defined
         for req_param in self.required:
             if req_param not in self.parameters:
                 raise ValueError(f"Required parameter '{req_param}' is not defined among parameters")
 
+        # The schema is fixed from here on, so build the dictionary representation up front
+        self._cached_dict = self._build_dict()
+
+    @property
+    def name(self):
+        """
+        Function name sent to the LLM.
+        """
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        self._refresh_dict()
+
+    @property
+    def purpose(self):
+        """
+        Purpose/description of the function sent to the LLM.
+        """
+        return self._purpose
+
+    @purpose.setter
+    def purpose(self, value):
+        self._purpose = value
+        self._refresh_dict()
+
+    @property
+    def parameters(self):
+        """
+        Dictionary of parameter info keyed by parameter name.
+        """
+        return self._parameters
+
+    @parameters.setter
+    def parameters(self, value):
+        self._parameters = value
+        self._refresh_dict()
+
+    @property
+    def required(self):
+        """
+        List of required parameter names.
+        """
+        return self._required
+
+    @required.setter
+    def required(self, value):
+        self._required = value
+        self._required_set = frozenset(value)  # For membership tests when building the dictionary
+        self._refresh_dict()
+
+    def _refresh_dict(self):
+        """
+        Rebuilds the dictionary representation after name, purpose, parameters or required are reassigned.
+        Does nothing while __init__ is still running; the dictionary is built once at its end.
+        """
+        if self._cached_dict is not None:
+            self._cached_dict = self._build_dict()
+            FunctionRegistry._cached_tools_list = None  # tools() holds the previous dictionary
+
     def _add_parameter(self, name, param_info):
         """
         Adds a parameter to the internal parameters dictionary.
@@ -200,17 +448,6 @@ class ToolWrapper:
         :param name: Name of the parameter.
         :param param_info: Type of the parameter or list of enumeration values.
         """
-        type_mapping = {  # Map Python types to JSON schema types.
-            int: 'integer',
-            float: 'number',
-            str: 'string',
-            bool: 'boolean',
-            list: "array",
-            tuple: "array",
-            dict: "object",
-            None: "null",
-        }
-
         # Check if the parameter is an enumeration
         if isinstance(param_info, list):
             parameter_type = 'array'
@@ -220,7 +457,7 @@ class ToolWrapper:
                 # If it is empty, throw an error
                 raise ValueError(f"Enum for parameter '{name}' must have at least one value.")
         else:  # Otherwise, use the type mapping
-            parameter_type = type_mapping.get(param_info, 'string')
+            parameter_type = _TYPE_MAPPING.get(param_info, 'string')
             enum_values = None
 
         # Construct the parameter dictionary
@@ -237,6 +474,16 @@ class ToolWrapper:
     def to_dict(self):
         """
         Converts the ToolWrapper instance into a standard dictionary format.
+        The returned dictionary is shared and must not be modified.
+        The dictionary is built once and only rebuilt when name, purpose, parameters or required are reassigned;
+        changes made inside the parameters dictionary or required list are not picked up.
+        :return: Dictionary representation of the ToolWrapper instance.
+        """
+        return self._cached_dict
+
+    def _build_dict(self):
+        """
+        Builds the dictionary representation returned by to_dict.
         :return: Dictionary representation of the ToolWrapper instance.
         """
         properties = {}
@@ -249,7 +496,7 @@ class ToolWrapper:
                 props['enum'] = param_info['enum']
             if param_info.get('description'):  # Add description if present
                 props['description'] = param_info['description']
-            if param_name in self.required:  # Mark as required if necessary
+            if param_name in self._required_set:  # Mark as required if necessary
                 required_fields.append(param_name)
 
             properties[param_name] = props
@@ -269,15 +516,18 @@ class ToolWrapper:
         }
 
 
-def tool(purpose, required=None, enabled=True, **kwargs):
+def tool(purpose, required=None, enabled=True, reads=None, writes=None, **kwargs):
     """
     A decorator for registering functions with additional metadata.
     Wraps the function in a ToolWrapper instance and registers it.
     :param purpose: Purpose or description of the function.
     :param required: List of required parameter names.
     :param enabled: Flag indicating if the function is initially enabled.
+    :param reads: List of resource names the function reads, used to order conflicting calls.
+    :param writes: List of resource names the function modifies, used to order conflicting calls.
     :param kwargs: Additional keyword arguments for parameter types and descriptions.
-    :return: Decorated function wrapped for registration and metadata association.
+    :return: The original function (or, for other callables such as bound methods and builtins, a wrapper
+             around it), registered and with its ToolWrapper attached as `_tool_wrapper`.
     """
     def decorator(func):
         # Create a ToolWrapper instance around the function
@@ -286,15 +536,23 @@ def tool(purpose, required=None, enabled=True, **kwargs):
             purpose=purpose,
             required=required,
             enabled=enabled,
+            reads=reads,
+            writes=writes,
             **kwargs,
         )
 
+        if inspect.isfunction(func):
+            # Return the function itself so direct calls don't go through an extra wrapper frame
+            decorated = func
+        else:
+            # Bound methods, builtins and other callables don't accept new attributes, so wrap them
+            @wraps(func)
+            def decorated(*args, **kwargs):
+                return func(*args, **kwargs)
+        decorated._tool_wrapper = tool_wrapper_instance
+
         # Register the ToolWrapper instance with the FunctionRegistry
         FunctionRegistry.register_function(func.__name__, tool_wrapper_instance)
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return func(*args, **kwargs)
-
-        return wrapper
+        return decorated
     return decorator
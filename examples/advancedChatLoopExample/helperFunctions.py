@@ -1,9 +1,14 @@
-import json
+import sys
 import asyncio
 from rich import print
 from llmFunctionDecorator import FunctionRegistry
 from litellm import acompletion
 
+try:  # orjson parses tool-call arguments considerably faster, but is optional
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 
 def append_to_message_history(messages, response_message):
     """Appends a new response message to the messages history and logs the addition."""
@@ -23,12 +28,11 @@ async def chat_completion(messages):
         stream=True
     )
 
-    contents = ""           # Initialize a variable to store the response contents
-    tool_calls_dict = {}    # Temporary dictionary to store tool calls by index
+    contents_parts = []     # Collect the streamed content pieces, joined once the stream ends
+    tool_calls_dict = {}    # Tool calls by index, already in the format expected in the response message
 
     async def text_iterator():
         """Helper function to iterate over the streamed response."""
-        nonlocal contents
         nonlocal tool_calls_dict
 
         # Iterate over chunks of the response as they arrive
@@ -37,29 +41,36 @@ async def chat_completion(messages):
             delta = chunk.choices[0].delta
 
             # If the delta contains tool calls, process them
-            if "tool_calls" in delta and delta.tool_calls is not None:
-                for tool_call in delta.tool_calls:
+            tool_calls = getattr(delta, 'tool_calls', None)
+            if tool_calls:
+                for tool_call in tool_calls:
                     index = tool_call.index  # Get the index of the tool call
-                    if index not in tool_calls_dict:  # Create a new dictionary entry if one doesn't exist
-                        tool_calls_dict[index] = {
+                    call = tool_calls_dict.get(index)
+                    if call is None:  # Create a new dictionary entry if one doesn't exist
+                        call = tool_calls_dict[index] = {
                             "id": tool_call.id,
-                            "name": None,
-                            "arguments": ""
+                            "function": {"name": None, "arguments": []},
+                            "type": "function"
                         }
+                    function = call["function"]
 
                     # If the tool call has a function name, add it to the dictionary
                     if tool_call.function.name is not None:
-                        tool_calls_dict[index]["name"] = tool_call.function.name
+                        function["name"] = tool_call.function.name
 
                     # If the tool call has function arguments, append them to the existing arguments
                     if tool_call.function.arguments is not None:
-                        tool_calls_dict[index]["arguments"] += tool_call.function.arguments
+                        function["arguments"].append(tool_call.function.arguments)
 
             # If the delta contains new content, process it
-            if delta.content is not None:
-                print(delta.content, end='')  # Print the content as it's being streamed
-                contents += delta.content  # Add the new content to the total contents
-                yield delta.content  # Yield the content so it can be processed by the caller
+            content = delta.content
+            if content is not None:
+                # Print the content as it's being streamed; a plain write is far cheaper than Rich's print,
+                # which is kept for the once-per-turn labels
+                sys.stdout.write(content)
+                sys.stdout.flush()
+                contents_parts.append(content)  # Add the new content to the total contents
+                yield content  # Yield the content so it can be processed by the caller
 
     # Process the streamed response
     async for _ in text_iterator():
@@ -67,41 +78,18 @@ async def chat_completion(messages):
 
     print("\n", end='')
 
-    response_message = {"role": "assistant", "content": contents}
-
-    # Convert the tool_calls_dict into a list
-    tool_calls = list(tool_calls_dict.values())
+    response_message = {"role": "assistant", "content": "".join(contents_parts)}
 
-    if tool_calls:  # If there are any tool calls
-        # Transform each tool call into the expected format
-        transformed_tool_calls = [{
-            "id": call["id"],
-            "function": {"name": call["name"], "arguments": call["arguments"]},
-            "type": "function"
-        } for call in tool_calls]
+    if tool_calls_dict:  # If there are any tool calls
+        # Join the streamed argument pieces of each tool call
+        for call in tool_calls_dict.values():
+            call["function"]["arguments"] = "".join(call["function"]["arguments"])
 
-        response_message["tool_calls"] = transformed_tool_calls  # Add the list of tool calls to the response message
+        response_message["tool_calls"] = list(tool_calls_dict.values())  # Add the list of tool calls to the response message
 
     return response_message
 
 
-async def async_tool_call(function_name, function_args):
-    """
-    Calls a tool function asynchronously with provided arguments.
-
-    Parameters:
-    - function_name (str): The name of the tool function to call.
-    - function_args (dict): The arguments to pass to the tool function.
-
-    Returns:
-    - dict: The result of the tool function call.
-    """
-    # Call the tool function with the provided arguments
-    result = FunctionRegistry.call_function(function_name, **function_args)
-
-    return result
-
-
 async def handle_tool_calls(response_message, messages):
     """
     Handles tool calls in the response message and updates the message history.
@@ -114,24 +102,30 @@ async def handle_tool_calls(response_message, messages):
     - dict: The new response message after handling tool calls.
     """
 
-    # Create a list of tasks by calling each tool function asynchronously
-    tasks = [
-        asyncio.create_task(
-            async_tool_call(
-                tool_call['function']['name'],
-                json.loads(tool_call['function']['arguments'])
-            )
-        ) for tool_call in response_message['tool_calls']
-    ]
+    tool_calls = response_message['tool_calls']
+
+    # Parse the arguments of each tool call once, they are reused when printing the responses
+    parsed_arguments = [_json_loads(tool_call['function']['arguments']) for tool_call in tool_calls]
+
+    # Run the tool calls wave by wave; calls that conflict through the reads/writes of @tool keep the requested order
+    function_responses = [None] * len(tool_calls)
+    for wave in FunctionRegistry.execution_waves([tool_call['function']['name'] for tool_call in tool_calls]):
+        # Create a list of tasks calling each tool function; regular functions run in a thread pool so the calls overlap
+        tasks = [
+            asyncio.create_task(
+                FunctionRegistry.acall_function(tool_calls[i]['function']['name'], **parsed_arguments[i])
+            ) for i in wave
+        ]
 
-    # Wait for all tasks to complete
-    function_responses = await asyncio.gather(*tasks)
+        # Wait for all tasks in the wave to complete
+        for i, function_response in zip(wave, await asyncio.gather(*tasks)):
+            function_responses[i] = function_response
 
     # Iterate over each tool call and its corresponding function response
-    for tool_call, function_response in zip(response_message['tool_calls'], function_responses):
+    for i, (tool_call, function_response) in enumerate(zip(tool_calls, function_responses)):
         # Print the function response
         print(
-            f"     Function response for {tool_call['function']['name']}({json.loads(tool_call['function']['arguments'])}):\n     ",
+            f"     Function response for {tool_call['function']['name']}({parsed_arguments[i]}):\n     ",
             function_response
         )
 
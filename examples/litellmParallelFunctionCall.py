@@ -1,14 +1,51 @@
 '''Modified example from https://litellm.vercel.app/docs/completion/function_call for use with llmFunctionWrapper'''
 
 import litellm
-import json
+import sys
+import asyncio
+import logging
+import importlib.util
 import os
+import httpx
 from llmFunctionDecorator import tool, FunctionRegistry
 from rich import print
 
+try:  # orjson is considerably faster than the standard library json module, but optional
+    import orjson
+    _json_loads = orjson.loads
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from json import loads as _json_loads, dumps as _json_dumps
+
+# Raw responses are logged at debug level; logging is only configured when this file is run as a script
+log = logging.getLogger(__name__)
+
 # set openai api key
 os.environ['OPENAI_API_KEY'] = "your API key here" # litellm reads OPENAI_API_KEY from .env and sends the request
 
+# One pooled HTTP client per run, shared by every request so the TLS connection stays open between completions.
+# HTTP/2 is used when the optional h2 package is installed (pip install httpx[http2]).
+def _make_http_client():
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_keepalive_connections=32),
+        timeout=60.0,
+    )
+
+
+# Canned responses keyed by lowercase city name; the weather payloads are serialized once at import
+_WEATHER_RESPONSES = {
+    "tokyo": _json_dumps({"location": "Tokyo", "temperature": "10", "unit": "celsius"}),
+    "san francisco": _json_dumps({"location": "San Francisco", "temperature": "72", "unit": "fahrenheit"}),
+    "paris": _json_dumps({"location": "Paris", "temperature": "22", "unit": "celsius"}),
+}
+_TIMES = {
+    "tokyo": "3:00 PM",
+    "san francisco": "12:00 PM",
+    "paris": "9:00 PM",
+}
+
 
 @tool(
     enabled=True,                                                               # optional enabled argument
@@ -18,17 +55,15 @@ os.environ['OPENAI_API_KEY'] = "your API key here" # litellm reads OPENAI_API_KE
     unit=["celsius", "fahrenheit"],                                             # possible values for the unit argument
     unit_description="The unit of temperature, e.g. celsius or fahrenheit",     # description of the unit argument
     required=["location"],                                                      # required arguments
+    reads=["weather"],                                                          # optional resources the function reads
 )
 def get_current_weather(location, unit="fahrenheit"):
     """Get the current weather in a given location"""
-    if "tokyo" in location.lower():
-        return json.dumps({"location": "Tokyo", "temperature": "10", "unit": "celsius"})
-    elif "san francisco" in location.lower():
-        return json.dumps({"location": "San Francisco", "temperature": "72", "unit": "fahrenheit"})
-    elif "paris" in location.lower():
-        return json.dumps({"location": "Paris", "temperature": "22", "unit": "celsius"})
-    else:
-        return json.dumps({"location": location, "temperature": "unknown"})
+    location_lower = location.lower()
+    for city, response in _WEATHER_RESPONSES.items():
+        if city in location_lower:
+            return response
+    return _json_dumps({"location": location, "temperature": "unknown"})
 
 
 @tool(
@@ -37,20 +72,18 @@ def get_current_weather(location, unit="fahrenheit"):
     location=str,                                                               # type of the location argument
     location_description="The city and state, e.g. San Francisco, CA",          # description of the location argument
     required=["location"],                                                      # required arguments
+    reads=["clock"],                                                            # optional resources the function reads
 )
 def get_current_time(location):
     """Get the current time in a given location"""
-    if "tokyo" in location.lower():
-        return json.dumps({"location": location, "time": "3:00 PM"})
-    elif "san francisco" in location.lower():
-        return json.dumps({"location": location, "time": "12:00 PM"})
-    elif "paris" in location.lower():
-        return json.dumps({"location": location, "time": "9:00 PM"})
-    else:
-        return "I don't know the time in " + location
+    location_lower = location.lower()
+    for city, time in _TIMES.items():
+        if city in location_lower:
+            return _json_dumps({"location": location, "time": time})
+    return "I don't know the time in " + location
 
 
-def test_parallel_function_call():
+async def test_parallel_function_call():
 
     # This will print the list of all callable (enabled) functions in the registry
     print("\nCallable functions present in FunctionRegistry:", FunctionRegistry.get_registry())
@@ -62,18 +95,18 @@ def test_parallel_function_call():
         # Step 1: send the conversation and available functions to the model
         messages = [{"role": "user", "content": "What's the weather like in San Francisco, Tokyo, and Paris? Also, please tell me the time in San Francisco as well."}]
 
-        response = litellm.completion(
+        response = await litellm.acompletion(
             model="gpt-3.5-turbo-1106",
             messages=messages,
             tools=FunctionRegistry.tools(),                     # get the list of all enabled functions
             tool_choice=FunctionRegistry.tool_choice(),         # since the registry contains callable functions, this will default to and return "auto"
         )
 
-        print("\nFirst LLM Response:\n", response)
+        log.debug("\nFirst LLM Response:\n%s", response)
         response_message = response.choices[0].message
         tool_calls = response_message.tool_calls
 
-        print("\n\nLength of tool calls", len(tool_calls))
+        log.debug("\n\nLength of tool calls %d", len(tool_calls))
 
         # Step 2: check if the model wanted to call a function
         if tool_calls:
@@ -82,33 +115,68 @@ def test_parallel_function_call():
             messages.append(response_message)  # extend conversation with assistant's reply
 
             # Step 4: send the info for each function call and function response to the model
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+            async def run_tool(tool_call):
                 # Use the FunctionRegistry to call the function and pass the arguments
-                function_response = FunctionRegistry.call_function(
-                    function_name,
-                    **function_args
+                function_response = await FunctionRegistry.acall_function(
+                    tool_call.function.name,
+                    **_json_loads(tool_call.function.arguments)
                 )
-
-                # This will print each response of the function calls
-                print("\nFunction response:\n", function_response)
-
-                messages.append(
-                    {
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response,
-                    }
-                )  # extend conversation with function response
-            second_response = litellm.completion(
+                return tool_call, function_response
+
+            # Calls that read or write the same resources (see reads/writes in @tool) are split into waves
+            # so they run in the order the model requested them; everything within a wave runs concurrently
+            waves = FunctionRegistry.execution_waves([tool_call.function.name for tool_call in tool_calls])
+            for wave in waves:
+                # Start every function call in the wave at once, then handle each response as soon as it finishes,
+                # so the second request goes out the moment the slowest call is done
+                tasks = [asyncio.create_task(run_tool(tool_calls[i])) for i in wave]
+                for next_done in asyncio.as_completed(tasks):
+                    tool_call, function_response = await next_done
+
+                    # This will log each response of the function calls
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("\nFunction response:\n%s", function_response)
+
+                    messages.append(
+                        {
+                            "tool_call_id": tool_call.id,
+                            "role": "tool",
+                            "name": tool_call.function.name,
+                            "content": function_response,
+                        }
+                    )  # extend conversation with function response
+            second_response = await litellm.acompletion(
                 model="gpt-3.5-turbo-1106",
                 messages=messages,
-            )  # get a new response from the model where it can see the function response
-            print("\n\nSecond LLM response:\n", second_response)
-            return second_response
+                stream=True,
+            )  # get a new response from the model where it can see the function response, streamed as it is generated
+            print("\n\nSecond LLM response:")
+            contents_parts = []
+            async for chunk in second_response:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    # print each piece of the response as soon as it arrives; flush so it isn't held in the buffer
+                    sys.stdout.write(content)
+                    sys.stdout.flush()
+                    contents_parts.append(content)
+            sys.stdout.write("\n")
+            return "".join(contents_parts)
     except Exception as e:
       print(f"Error occurred: {e}")
 
-test_parallel_function_call()
+
+async def main():
+    # Leaving the block closes the pooled connections before asyncio.run closes the event loop
+    async with _make_http_client() as http_client:
+        litellm.aclient_session = http_client  # used by every litellm.acompletion call
+        try:
+            await test_parallel_function_call()
+        finally:
+            litellm.aclient_session = None  # don't leave litellm pointing at a closed client
+
+
+if __name__ == "__main__":
+    # Set the level to logging.INFO to skip the raw responses and their formatting cost
+    logging.basicConfig(format="%(message)s")
+    log.setLevel(logging.DEBUG)
+    asyncio.run(main())
@@ -1,12 +1,47 @@
 '''Modified example from https://platform.openai.com/docs/guides/function-calling for use with llmFunctionDecorator'''
 
-from openai import OpenAI
-import json
+from openai import AsyncOpenAI
+import sys
+import asyncio
+import logging
+import importlib.util
+import httpx
 from llmFunctionDecorator import tool, FunctionRegistry
 from rich import print
 
-
-client = OpenAI()
+try:  # orjson is considerably faster than the standard library json module, but optional
+    import orjson
+    _json_loads = orjson.loads
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from json import loads as _json_loads, dumps as _json_dumps
+
+# Raw responses are logged at debug level; logging is only configured when this file is run as a script
+log = logging.getLogger(__name__)
+
+
+# One pooled HTTP client per run, shared by every request so the TLS connection stays open between completions.
+# HTTP/2 is used when the optional h2 package is installed (pip install httpx[http2]).
+def _make_http_client():
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_keepalive_connections=32),
+        timeout=60.0,
+    )
+
+
+# Canned responses keyed by lowercase city name; the weather payloads are serialized once at import
+_WEATHER_RESPONSES = {
+    "tokyo": _json_dumps({"location": "Tokyo", "temperature": "10", "unit": "celsius"}),
+    "san francisco": _json_dumps({"location": "San Francisco", "temperature": "72", "unit": "fahrenheit"}),
+    "paris": _json_dumps({"location": "Paris", "temperature": "22", "unit": "celsius"}),
+}
+_TIMES = {
+    "tokyo": "3:00 PM",
+    "san francisco": "12:00 PM",
+    "paris": "9:00 PM",
+}
 
 
 @tool(
@@ -17,17 +52,15 @@ client = OpenAI()
     unit=["celsius", "fahrenheit"],                                             # possible values for the unit argument
     unit_description="The unit of temperature, e.g. celsius or fahrenheit",     # description of the unit argument
     required=["location"],                                                      # required arguments
+    reads=["weather"],                                                          # optional resources the function reads
 )
 def get_current_weather(location, unit="fahrenheit"):
     """Get the current weather in a given location"""
-    if "tokyo" in location.lower():
-        return json.dumps({"location": "Tokyo", "temperature": "10", "unit": "celsius"})
-    elif "san francisco" in location.lower():
-        return json.dumps({"location": "San Francisco", "temperature": "72", "unit": "fahrenheit"})
-    elif "paris" in location.lower():
-        return json.dumps({"location": "Paris", "temperature": "22", "unit": "celsius"})
-    else:
-        return json.dumps({"location": location, "temperature": "unknown"})
+    location_lower = location.lower()
+    for city, response in _WEATHER_RESPONSES.items():
+        if city in location_lower:
+            return response
+    return _json_dumps({"location": location, "temperature": "unknown"})
 
 
 @tool(
@@ -36,20 +69,18 @@ def get_current_weather(location, unit="fahrenheit"):
     location=str,                                                               # type of the location argument
     location_description="The city and state, e.g. San Francisco, CA",          # description of the location argument
     required=["location"],                                                      # required arguments
+    reads=["clock"],                                                            # optional resources the function reads
 )
 def get_current_time(location):
     """Get the current time in a given location"""
-    if "tokyo" in location.lower():
-        return json.dumps({"location": location, "time": "3:00 PM"})
-    elif "san francisco" in location.lower():
-        return json.dumps({"location": location, "time": "12:00 PM"})
-    elif "paris" in location.lower():
-        return json.dumps({"location": location, "time": "9:00 PM"})
-    else:
-        return "I don't know the time in " + location
+    location_lower = location.lower()
+    for city, time in _TIMES.items():
+        if city in location_lower:
+            return _json_dumps({"location": location, "time": time})
+    return "I don't know the time in " + location
 
 
-def test_parallel_function_call():
+async def test_parallel_function_call(client):
 
     # This will print the list of all callable (enabled) functions in the registry
     print("\nCallable functions present in FunctionRegistry:", FunctionRegistry.get_registry())
@@ -61,18 +92,18 @@ def test_parallel_function_call():
         # Step 1: send the conversation and available functions to the model
         messages = [{"role": "user", "content": "What's the weather like in San Francisco, Tokyo, and Paris? Also, please tell me the time in San Francisco as well."}]
 
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-3.5-turbo-1106",
             messages=messages,
             tools=FunctionRegistry.tools(),                     # get the list of all enabled functions
             tool_choice=FunctionRegistry.tool_choice(),         # since the registry contains callable functions, this will default to and return "auto"
         )
 
-        print("\nFirst LLM Response:\n", response)
+        log.debug("\nFirst LLM Response:\n%s", response)
         response_message = response.choices[0].message
         tool_calls = response_message.tool_calls
 
-        print("\n\nLength of tool calls", len(tool_calls))
+        log.debug("\n\nLength of tool calls %d", len(tool_calls))
 
         # Step 2: check if the model wanted to call a function
         if tool_calls:
@@ -81,33 +112,130 @@ def test_parallel_function_call():
             messages.append(response_message)  # extend conversation with assistant's reply
 
             # Step 4: send the info for each function call and function response to the model
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
+            async def run_tool(tool_call):
                 # Use the FunctionRegistry to call the function and pass the arguments
-                function_response = FunctionRegistry.call_function(
-                    function_name,
-                    **function_args
+                function_response = await FunctionRegistry.acall_function(
+                    tool_call.function.name,
+                    **_json_loads(tool_call.function.arguments)
                 )
-
-                # This will print each response of the function calls
-                print("\nFunction response:\n", function_response)
-
-                messages.append(
-                    {
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response,
-                    }
-                )  # extend conversation with function response
-            second_response = client.chat.completions.create(
+                return tool_call, function_response
+
+            # Calls that read or write the same resources (see reads/writes in @tool) are split into waves
+            # so they run in the order the model requested them; everything within a wave runs concurrently
+            waves = FunctionRegistry.execution_waves([tool_call.function.name for tool_call in tool_calls])
+            for wave in waves:
+                # Start every function call in the wave at once, then handle each response as soon as it finishes,
+                # so the second request goes out the moment the slowest call is done
+                tasks = [asyncio.create_task(run_tool(tool_calls[i])) for i in wave]
+                for next_done in asyncio.as_completed(tasks):
+                    tool_call, function_response = await next_done
+
+                    # This will log each response of the function calls
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("\nFunction response:\n%s", function_response)
+
+                    messages.append(
+                        {
+                            "tool_call_id": tool_call.id,
+                            "role": "tool",
+                            "name": tool_call.function.name,
+                            "content": function_response,
+                        }
+                    )  # extend conversation with function response
+            second_response = await client.chat.completions.create(
                 model="gpt-3.5-turbo-1106",
                 messages=messages,
-            )  # get a new response from the model where it can see the function response
-            print("\n\nSecond LLM response:\n", second_response)
-            return second_response
+                stream=True,
+            )  # get a new response from the model where it can see the function response, streamed as it is generated
+            print("\n\nSecond LLM response:")
+            contents_parts = []
+            async for chunk in second_response:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    # print each piece of the response as soon as it arrives; flush so it isn't held in the buffer
+                    sys.stdout.write(content)
+                    sys.stdout.flush()
+                    contents_parts.append(content)
+            sys.stdout.write("\n")
+            return "".join(contents_parts)
     except Exception as e:
       print(f"Error occurred: {e}")
 
-test_parallel_function_call()
+
+async def run_batch(client, prompts, poll_interval=30):
+    """
+    Sends the first turn of many conversations through OpenAI's Batch API, which costs less than
+    individual requests but may take up to 24 hours. Use test_parallel_function_call for interactive use.
+    client is an AsyncOpenAI instance; closing it is left to the caller, as in main below.
+    Returns the first assistant message (possibly with tool calls) for each prompt, in order,
+    or None for prompts whose request failed.
+    """
+    # The API rejects null tools/tool_choice, so only send them when there are enabled functions
+    tool_options = {}
+    tools = FunctionRegistry.tools()
+    if tools is not None:
+        tool_options["tools"] = tools
+        tool_options["tool_choice"] = FunctionRegistry.tool_choice()
+
+    # One chat completion request per line, tagged with its position so results can be put back in order
+    requests = "\n".join(
+        _json_dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-3.5-turbo-1106",
+                "messages": [{"role": "user", "content": prompt}],
+                **tool_options,
+            },
+        }) for i, prompt in enumerate(prompts)
+    )
+
+    batch_file = await client.files.create(file=("batch.jsonl", requests.encode()), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    # Wait for the batch to finish without blocking the event loop
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+
+    # A batch where every request failed still completes, but only has an error file
+    if batch.output_file_id is None:
+        details = ""
+        if batch.error_file_id is not None:
+            errors = await client.files.content(batch.error_file_id)
+            details = f":\n{errors.text}"
+        raise RuntimeError(f"Every request in batch {batch.id} failed{details}")
+
+    output = await client.files.content(batch.output_file_id)
+    results = [None] * len(prompts)
+    for line in output.text.splitlines():
+        result = _json_loads(line)
+        response = result["response"]
+        if response is not None and response["status_code"] == 200:
+            results[int(result["custom_id"])] = response["body"]["choices"][0]["message"]
+    return results
+
+
+async def main():
+    # Leaving the block closes the pooled connections before asyncio.run closes the event loop
+    async with _make_http_client() as http_client:
+        client = AsyncOpenAI(http_client=http_client)
+        await test_parallel_function_call(client)
+
+        # For offline workloads, many prompts can be sent through the Batch API instead:
+        # print(await run_batch(client, ["What's the weather like in Paris?", "What time is it in Tokyo?"]))
+
+
+if __name__ == "__main__":
+    # Set the level to logging.INFO to skip the raw responses and their formatting cost
+    logging.basicConfig(format="%(message)s")
+    log.setLevel(logging.DEBUG)
+    asyncio.run(main())